@@ -0,0 +1,221 @@
+"""Async (ASGI) serving layer for the backend.
+
+Request handling never blocks the event loop: light endpoints answer
+directly or on a small dedicated thread limiter, uploads are streamed to
+disk in chunks, and the CPU-heavy pipeline runs on its own executor (and
+behind the backend's admission control). A burst of /process_video calls
+therefore cannot make /available_features or /get_resolution wait.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+The Flask app in backend.py keeps working with `python backend.py`.
+"""
+import asyncio
+import contextlib
+import os
+import shutil
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import anyio
+from starlette.applications import Starlette
+from starlette.requests import ClientDisconnect, Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+from werkzeug.utils import secure_filename
+
+import backend
+import metrics
+
+# Threads for the long-running pipeline jobs; most of them wait in admission control
+HEAVY_WORKERS = int(os.environ.get("HEAVY_WORKERS", 8))
+# Threads for short blocking calls (probing a file, moving an upload into place)
+LIGHT_WORKERS = int(os.environ.get("LIGHT_WORKERS", 16))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+heavy_executor = ThreadPoolExecutor(max_workers=HEAVY_WORKERS, thread_name_prefix="pipeline")
+light_limiter = anyio.CapacityLimiter(LIGHT_WORKERS)
+
+async def run_heavy(func, *args):
+    """Runs CPU-heavy work on the pipeline executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(heavy_executor, func, *args)
+
+async def run_light(func, *args):
+    """Runs a short blocking call without queueing behind pipeline jobs."""
+    return await anyio.to_thread.run_sync(func, *args, limiter=light_limiter)
+
+def upload_destination(filename):
+    return os.path.join(backend.app.config["UPLOAD_FOLDER"], secure_filename(filename))
+
+def partial_upload_path(file_path):
+    # Same folder, so the final os.replace is atomic; storage scans skip .tmp files
+    return f"{file_path}.{uuid.uuid4().hex}.tmp"
+
+def discard_partial(partial_path):
+    with contextlib.suppress(OSError):
+        os.remove(partial_path)
+
+def finish_upload(file_path):
+    backend.storage_manager.track(file_path)
+    backend.storage_manager.enforce_quotas(keep=[file_path])
+
+async def upload_file(request: Request):
+    """Streams an upload to disk.
+
+    Accepts the same multipart form as the Flask endpoint (field "file"), or a
+    raw request body with the name in the ?filename= query parameter.
+    """
+    content_type = request.headers.get("content-type", "")
+
+    if content_type.startswith("multipart/form-data"):
+        # Starlette parses the body incrementally and spools large parts to disk
+        async with request.form() as form:
+            upload = form.get("file")
+            if upload is None or isinstance(upload, str):
+                return JSONResponse({"error": "No file part"}, status_code=400)
+            if upload.filename == "":
+                return JSONResponse({"error": "No selected file"}, status_code=400)
+            if not backend.allowed_file(upload.filename):
+                return JSONResponse({"error": "File type not allowed"}, status_code=400)
+
+            file_path = upload_destination(upload.filename)
+
+            def save_spooled():
+                partial_path = partial_upload_path(file_path)
+                try:
+                    upload.file.seek(0)
+                    with open(partial_path, "wb") as f:
+                        shutil.copyfileobj(upload.file, f, UPLOAD_CHUNK_SIZE)
+                    os.replace(partial_path, file_path)
+                except BaseException:
+                    discard_partial(partial_path)
+                    raise
+
+            await run_light(save_spooled)
+    else:
+        filename = request.query_params.get("filename", "")
+        if filename == "":
+            return JSONResponse({"error": "No selected file"}, status_code=400)
+        if not backend.allowed_file(filename):
+            return JSONResponse({"error": "File type not allowed"}, status_code=400)
+
+        file_path = upload_destination(filename)
+        # Stream into a temporary file so an interrupted upload never shows up under the real name
+        partial_path = partial_upload_path(file_path)
+        try:
+            async with await anyio.open_file(partial_path, "wb") as f:
+                async for chunk in request.stream():
+                    await f.write(chunk)
+            os.replace(partial_path, file_path)
+        except ClientDisconnect:
+            discard_partial(partial_path)
+            return JSONResponse({"error": "Upload interrupted"}, status_code=400)
+        except BaseException:
+            discard_partial(partial_path)
+            raise
+
+    await run_light(finish_upload, file_path)
+    return JSONResponse({
+        "message": "File uploaded successfully",
+        "file_path": file_path
+    })
+
+async def get_resolution(request: Request):
+    """Fetches the original resolution of the uploaded video."""
+    data = await request.json()
+    try:
+        info = await run_light(backend.probe_video, data["file_path"])
+        return JSONResponse({
+            "resolution": f"{info['width']}x{info['height']}",
+            "width": info["width"],
+            "height": info["height"]
+        })
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+async def process_video(request: Request):
+    """Processes video based on user selection, off the event loop."""
+    data = await request.json()
+    try:
+        if backend.is_streaming_request(data):
+            return JSONResponse(backend.start_streaming_job(data), status_code=202)
+
+        result = await run_heavy(backend.run_pipeline, data)
+        if not result:
+            return JSONResponse({"error": "Failed to process video"}, status_code=500)
+
+        return JSONResponse(result)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+async def preview_video(request: Request):
+    """Renders a fast low-resolution preview, off the event loop."""
+    data = await request.json()
+    try:
+        result, error = await run_heavy(backend.run_preview, data)
+        if error:
+            return JSONResponse({"error": error}, status_code=500)
+
+        return JSONResponse(result)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+async def job_status(request: Request):
+    """Reports the status of a background streaming job."""
+    job = backend.get_job(request.path_params["job_id"])
+    if job is None:
+        return JSONResponse({"error": "Unknown job"}, status_code=404)
+    return JSONResponse(job)
+
+async def available_features(request: Request):
+    """Returns available features status."""
+    return JSONResponse(backend.get_available_features())
+
+async def scheduler_status(request: Request):
+    """Reports how much of the CPU/memory budget running jobs are using."""
+    return JSONResponse(backend.job_scheduler.status())
+
+async def storage_status(request: Request):
+    """Reports disk usage of each managed folder against its quota."""
+    return JSONResponse(await run_light(backend.storage_manager.status))
+
+async def metrics_endpoint(request: Request):
+    """Exposes pipeline stage timings and counters in Prometheus text format."""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+class OutputFiles(StaticFiles):
+    """Serves outputs with Range/ETag/Last-Modified support and records the access for LRU eviction."""
+
+    async def get_response(self, path, scope):
+        response = await super().get_response(path, scope)
+        if path.endswith(".m3u8"):
+            # The playlist keeps growing until the job finishes
+            response.headers["Cache-Control"] = "no-cache"
+        if response.status_code in (200, 206, 304):
+            full_path = os.path.join(backend.app.config["OUTPUT_FOLDER"], path)
+            await run_light(backend.storage_manager.touch, full_path)
+        return response
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    yield
+    heavy_executor.shutdown(wait=False, cancel_futures=True)
+
+app = Starlette(
+    routes=[
+        Route("/upload", upload_file, methods=["POST"]),
+        Route("/get_resolution", get_resolution, methods=["POST"]),
+        Route("/process_video", process_video, methods=["POST"]),
+        Route("/preview_video", preview_video, methods=["POST"]),
+        Route("/jobs/{job_id}", job_status, methods=["GET"]),
+        Route("/available_features", available_features, methods=["GET"]),
+        Route("/scheduler", scheduler_status, methods=["GET"]),
+        Route("/storage", storage_status, methods=["GET"]),
+        Route("/metrics", metrics_endpoint, methods=["GET"]),
+        Mount("/download", OutputFiles(directory=backend.app.config["OUTPUT_FOLDER"])),
+        Mount("/stream", OutputFiles(directory=backend.app.config["OUTPUT_FOLDER"])),
+    ],
+    lifespan=lifespan,
+)
@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, send_from_directory, Response
 import os
 import cv2
 import numpy as np
@@ -10,6 +10,15 @@ import re
 import whisper
 from werkzeug.utils import secure_filename
 import tempfile
+import time
+import subprocess
+import threading
+from moviepy.config import get_setting
+import metrics
+from scheduler import JobScheduler, estimate_job_cost
+from storage import StorageManager
+from geometry import parse_aspect_ratio, compute_resize_dimensions
+from silence import MIN_REMOVED_SECONDS, compute_keep_intervals, remap_captions
 
 app = Flask(__name__)
 
@@ -24,6 +33,26 @@ app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 app.config["OUTPUT_FOLDER"] = OUTPUT_FOLDER
 app.config["TEMP_FOLDER"] = TEMP_FOLDER
 
+# Resource budget shared by all concurrent jobs (defaults: every core, 75% of RAM)
+app.config["CPU_BUDGET"] = int(os.environ.get("CPU_BUDGET", 0)) or None
+app.config["MEMORY_BUDGET_MB"] = int(os.environ.get("MEMORY_BUDGET_MB", 0)) or None
+# Let a fronting nginx/Apache send output files itself instead of the Python process
+app.config["USE_X_SENDFILE"] = os.environ.get("USE_X_SENDFILE", "0") == "1"
+job_scheduler = JobScheduler(app.config["CPU_BUDGET"], app.config["MEMORY_BUDGET_MB"])
+
+# Disk quotas per folder; least recently used files are evicted once a folder is over
+app.config["UPLOAD_QUOTA_MB"] = int(os.environ.get("UPLOAD_QUOTA_MB", 10240))
+app.config["OUTPUT_QUOTA_MB"] = int(os.environ.get("OUTPUT_QUOTA_MB", 20480))
+app.config["TEMP_QUOTA_MB"] = int(os.environ.get("TEMP_QUOTA_MB", 5120))
+storage_manager = StorageManager(
+    {
+        UPLOAD_FOLDER: app.config["UPLOAD_QUOTA_MB"] * 1024 * 1024,
+        OUTPUT_FOLDER: app.config["OUTPUT_QUOTA_MB"] * 1024 * 1024,
+        TEMP_FOLDER: app.config["TEMP_QUOTA_MB"] * 1024 * 1024,
+    },
+    os.path.join(TEMP_FOLDER, "storage_index.json")
+)
+
 # Load Whisper model
 try:
     stt_model = whisper.load_model("base")
@@ -63,6 +92,8 @@ def upload_file():
     filename = secure_filename(file.filename)
     file_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
     file.save(file_path)
+    storage_manager.track(file_path)
+    storage_manager.enforce_quotas(keep=[file_path])
 
     return jsonify({
         "message": "File uploaded successfully",
@@ -89,44 +120,183 @@ def get_resolution():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-def parse_aspect_ratio(aspect_ratio_str):
-    """Parse an aspect ratio string like '16:9' into a tuple of integers."""
-    match = re.match(r'(\d+):(\d+)', aspect_ratio_str)
-    if match:
-        return (int(match.group(1)), int(match.group(2)))
-    return None
+def probe_video(video_path):
+    """Reads width, height, fps, frame count and duration of a video."""
+    cap = cv2.VideoCapture(video_path)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    duration = frame_count / fps if fps > 0 else 0.0
+    return {
+        "width": width,
+        "height": height,
+        "fps": fps,
+        "frame_count": frame_count,
+        "duration": duration
+    }
+
+# Named libx264 speed/size tiers used by every write path
+ENCODER_TIERS = {
+    "draft": {"preset": "ultrafast", "crf": 30, "tune": "fastdecode"},
+    "standard": {"preset": "medium", "crf": 23, "tune": None},
+    "archive": {"preset": "slower", "crf": 20, "tune": None},
+}
+# Intermediates are re-encoded by a later stage: fast to write, close to lossless
+INTERMEDIATE_CRF = 14
+
+def get_encoder_params(quality="standard", crf=None, preset=None, threads=None, tune=None):
+    """Builds write_videofile keyword arguments for a quality tier, with optional overrides."""
+    tier = ENCODER_TIERS.get(quality)
+    if tier is None:
+        print(f"Unknown quality tier: {quality}. Using standard")
+        tier = ENCODER_TIERS["standard"]
+
+    crf = tier["crf"] if crf is None else crf
+    tune = tier["tune"] if tune is None else tune
+
+    ffmpeg_params = ["-crf", str(crf)]
+    if tune:
+        ffmpeg_params += ["-tune", tune]
+
+    return {
+        "codec": "libx264",
+        "audio_codec": "aac",
+        "preset": preset or tier["preset"],
+        "threads": threads,
+        "ffmpeg_params": ffmpeg_params,
+    }
+
+# Output modes: a regular file, fragmented MP4 or an HLS event playlist
+OUTPUT_MODES = {"file", "fmp4", "hls"}
+HLS_SEGMENT_SECONDS = 4
+
+def get_stream_path(job_id, output_mode):
+    """Returns the path a streaming job writes to, inside its own job folder."""
+    job_folder = os.path.join(app.config["OUTPUT_FOLDER"], job_id)
+    os.makedirs(job_folder, exist_ok=True)
+    filename = "index.m3u8" if output_mode == "hls" else "output.mp4"
+    return os.path.join(job_folder, filename)
+
+def get_stream_output_params(output_path, output_mode):
+    """ffmpeg muxer arguments that make the output playable while it is still being written."""
+    if output_mode == "hls":
+        segment_pattern = os.path.join(os.path.dirname(output_path), "segment_%05d.ts")
+        return [
+            "-f", "hls",
+            "-hls_time", str(HLS_SEGMENT_SECONDS),
+            "-hls_playlist_type", "event",
+            "-hls_segment_filename", segment_pattern,
+        ]
+    if output_mode == "fmp4":
+        return ["-movflags", "+frag_keyframe+empty_moov+default_base_moof"]
+    return []
+
+def with_stream_output(encoder_params, output_path, output_mode):
+    """Adds streaming muxer arguments (and regular keyframes to cut segments on) to encoder parameters."""
+    ffmpeg_params = list(encoder_params["ffmpeg_params"])
+    ffmpeg_params += ["-force_key_frames", f"expr:gte(t,n_forced*{HLS_SEGMENT_SECONDS})"]
+    ffmpeg_params += get_stream_output_params(output_path, output_mode)
+    return dict(encoder_params, ffmpeg_params=ffmpeg_params)
+
+def get_output_bytes(output_path):
+    """Size of a written output; for HLS this is the playlist plus all its segments."""
+    if not os.path.exists(output_path):
+        return 0
+    if output_path.endswith(".m3u8"):
+        folder = os.path.dirname(output_path)
+        return sum(entry.stat().st_size for entry in os.scandir(folder) if entry.is_file())
+    return os.path.getsize(output_path)
+
+def write_clip(clip, output_path, stage, encoder_params=None):
+    """Encodes a moviepy clip to output_path and records the write as a timed pipeline stage."""
+    # moviepy names its temp audio after the output file, relative to the CWD, so fixed
+    # output names (index.m3u8, output.mp4) would collide between concurrent jobs
+    temp_audiofile = os.path.join(app.config["TEMP_FOLDER"], f"audio_{uuid.uuid4().hex}.m4a")
+    with metrics.stage_timer(stage) as stats:
+        clip.write_videofile(
+            output_path,
+            temp_audiofile=temp_audiofile,
+            **(encoder_params or get_encoder_params())
+        )
+        stats["media_seconds"] = clip.duration or 0.0
+        stats["frames"] = int((clip.duration or 0) * (clip.fps or 0))
+        stats["bytes_written"] = get_output_bytes(output_path)
+    return output_path
+
+# Subtitle codec to use when muxing soft captions into each container
+SUBTITLE_CODECS = {"mp4": "mov_text", "mov": "mov_text", "mkv": "srt", "webm": "webvtt"}
+
+def remux_video(video_path, output_path, subtitle_path=None, output_mode="file"):
+    """Copies the streams into a new container without re-encoding, optionally adding a subtitle track."""
+    command = [get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error", "-i", video_path]
+    if subtitle_path:
+        command += ["-i", subtitle_path]
+    command += ["-map", "0:v", "-map", "0:a?"]
+    if subtitle_path:
+        extension = output_path.rsplit(".", 1)[-1].lower()
+        subtitle_codec = SUBTITLE_CODECS.get(extension)
+        if subtitle_codec is None:
+            print(f"Soft captions are not supported for .{extension} output")
+            return None
+        command += ["-map", "1:s", "-c:s", subtitle_codec]
+    command += ["-c:v", "copy", "-c:a", "copy"]
+    if output_mode != "file":
+        command += get_stream_output_params(output_path, output_mode)
+    elif output_path.lower().endswith((".mp4", ".mov")):
+        command += ["-movflags", "+faststart"]
+    command.append(output_path)
 
-def resize_video(video_path, output_path, aspect_ratio_str, resolution_percentage):
+    try:
+        subprocess.run(command, check=True, capture_output=True)
+        return output_path
+    except subprocess.CalledProcessError as e:
+        print(f"Error remuxing video: {e.stderr.decode(errors='ignore').strip()}")
+        return None
+    except Exception as e:
+        print(f"Error remuxing video: {e}")
+        return None
+
+def resize_video(video_path, output_path, aspect_ratio_str, resolution_percentage, encoder_params=None,
+                 output_mode="file", allow_remux=True):
     """Resizes the video based on the percentage of original resolution while maintaining aspect ratio."""
     try:
         # Get original resolution
         clip = mp.VideoFileClip(video_path)
         original_width, original_height = clip.size
 
-        # Calculate new resolution
-        scale_factor = resolution_percentage / 100
-        new_width = int(original_width * scale_factor)
-        new_height = int(original_height * scale_factor)
-
-        # Adjust aspect ratio if provided
-        aspect_ratio = parse_aspect_ratio(aspect_ratio_str)
-        if aspect_ratio:
-            aspect_w, aspect_h = aspect_ratio
-            if (new_width / new_height) != (aspect_w / aspect_h):
-                new_height = int(new_width * aspect_h / aspect_w)
+        new_width, new_height = compute_resize_dimensions(
+            original_width,
+            original_height,
+            aspect_ratio_str,
+            resolution_percentage
+        )
+
+        # Geometry is unchanged, so only the container (if anything) needs to change
+        if allow_remux and (new_width, new_height) == (original_width, original_height):
+            clip.close()
+            print("Output geometry matches the source. Remuxing without re-encoding")
+            if remux_video(video_path, output_path, output_mode=output_mode):
+                metrics.inc_counter("pipeline_cache_hits_total", fast_path="remux")
+                return output_path
+            print("Remux failed. Falling back to re-encoding")
+            clip = mp.VideoFileClip(video_path)
 
         print(f"Resizing video to {new_width}x{new_height}")
 
         # Resize video
         resized_clip = clip.resize(newsize=(new_width, new_height))
-        resized_clip.write_videofile(output_path, codec="libx264", audio_codec="aac")
+        write_clip(resized_clip, output_path, "resize_encode", encoder_params)
 
         return output_path
     except Exception as e:
         print(f"Error resizing video: {e}")
         return None
 
-def crop_video_to_face(video_path, output_path, aspect_ratio_str, target_width, target_height):
+def crop_video_to_face(video_path, output_path, aspect_ratio_str, target_width, target_height,
+                       encoder_params=None):
     """Crops the video to track faces and resizes to target dimensions."""
     if yolo_model is None:
         print("YOLO model not loaded. Face tracking is disabled.")
@@ -150,15 +320,25 @@ def crop_video_to_face(video_path, output_path, aspect_ratio_str, target_width,
         cropped_frames = []
         frame_count = 0
 
+        # Time spent in each per-frame step, recorded once the loop finishes
+        decode_seconds = 0.0
+        detect_seconds = 0.0
+        crop_seconds = 0.0
+
         while cap.isOpened():
+            step_start = time.perf_counter()
             ret, frame = cap.read()
+            decode_seconds += time.perf_counter() - step_start
             if not ret:
                 break  # Stop if video ends
 
             frame_count += 1
 
             # Perform YOLO face detection
+            step_start = time.perf_counter()
             results = yolo_model(frame)
+            detect_seconds += time.perf_counter() - step_start
+            step_start = time.perf_counter()
 
             # Check if a face is detected
             face_detected = False
@@ -217,8 +397,15 @@ def crop_video_to_face(video_path, output_path, aspect_ratio_str, target_width,
                 cropped_frame = cv2.cvtColor(cropped_frame, cv2.COLOR_BGR2RGB)
                 cropped_frames.append(cropped_frame)
 
+            crop_seconds += time.perf_counter() - step_start
+
         cap.release()
 
+        media_seconds = frame_count / fps if fps else 0.0
+        metrics.record_stage("decode", decode_seconds, frames=frame_count, media_seconds=media_seconds)
+        metrics.record_stage("yolo_detect", detect_seconds, frames=frame_count, media_seconds=media_seconds)
+        metrics.record_stage("face_crop", crop_seconds, frames=frame_count, media_seconds=media_seconds)
+
         if cropped_frames:
             # Create video clip from cropped frames
             cropped_video = ImageSequenceClip(cropped_frames, fps=fps)
@@ -229,7 +416,7 @@ def crop_video_to_face(video_path, output_path, aspect_ratio_str, target_width,
                 cropped_video = cropped_video.set_audio(orig_clip.audio)
 
             # Write output
-            cropped_video.write_videofile(output_path, codec="libx264", audio_codec="aac")
+            write_clip(cropped_video, output_path, "face_crop_encode", encoder_params)
             return output_path
         else:
             print("No frames processed!")
@@ -238,6 +425,47 @@ def crop_video_to_face(video_path, output_path, aspect_ratio_str, target_width,
         print(f"Error in face tracking: {e}")
         return None
 
+def remove_silence(video_path, output_path, threshold_db=-40.0, min_silence=0.5, padding=0.15,
+                   encoder_params=None):
+    """Cuts silent stretches out of the video. Returns (output_path, keep_intervals)."""
+    try:
+        clip = mp.VideoFileClip(video_path)
+        if clip.audio is None:
+            print("No audio track found. Skipping silence removal.")
+            return None, None
+
+        sample_rate = 16000
+        with metrics.stage_timer("silence_detect") as stats:
+            samples = clip.audio.to_soundarray(fps=sample_rate)
+            intervals = compute_keep_intervals(
+                samples,
+                sample_rate,
+                threshold_db=threshold_db,
+                min_silence=min_silence,
+                padding=padding
+            )
+            stats["media_seconds"] = clip.duration
+
+        if not intervals:
+            print("Video is entirely silent. Skipping silence removal.")
+            return None, None
+
+        intervals = [(start, min(end, clip.duration)) for start, end in intervals]
+        removed = clip.duration - sum(end - start for start, end in intervals)
+        if removed < MIN_REMOVED_SECONDS:
+            # Keep using the source, so later stages can still take the remux fast path
+            print("No silence long enough to cut. Skipping silence removal.")
+            return None, None
+        print(f"Keeping {len(intervals)} non-silent segments, cutting {removed:.1f}s")
+
+        kept_clip = concatenate_videoclips([clip.subclip(start, end) for start, end in intervals])
+        write_clip(kept_clip, output_path, "silence_encode", encoder_params)
+
+        return output_path, intervals
+    except Exception as e:
+        print(f"Error removing silence: {e}")
+        return None, None
+
 def extract_audio(video_path, audio_path="temp_audio.wav"):
     """Extracts audio from a video file."""
     try:
@@ -256,9 +484,16 @@ def generate_captions(video_path):
         return "Captions not available. Whisper model not loaded."
 
     try:
-        audio_path = extract_audio(video_path)
+        # Unique name so concurrent jobs don't overwrite each other's audio
+        audio_path = extract_audio(
+            video_path,
+            os.path.join(app.config["TEMP_FOLDER"], f"audio_{uuid.uuid4().hex}.wav")
+        )
         if audio_path:
-            result = stt_model.transcribe(audio_path)
+            with metrics.stage_timer("whisper") as stats:
+                result = stt_model.transcribe(audio_path)
+                if result["segments"]:
+                    stats["media_seconds"] = result["segments"][-1]["end"]
             os.remove(audio_path)
 
             captions = []
@@ -274,7 +509,34 @@ def generate_captions(video_path):
         print(f"Error generating captions: {e}")
         return "Error generating captions", None
 
-def overlay_captions(video_path, captions, output_path):
+def format_srt_timestamp(seconds):
+    """Formats seconds as an SRT timestamp (HH:MM:SS,mmm)."""
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    secs, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{milliseconds:03d}"
+
+def write_srt(captions, srt_path):
+    """Writes captions to an SRT subtitle file."""
+    with open(srt_path, "w", encoding="utf-8") as f:
+        for index, ((start_time, end_time), text) in enumerate(captions, start=1):
+            f.write(f"{index}\n")
+            f.write(f"{format_srt_timestamp(start_time)} --> {format_srt_timestamp(end_time)}\n")
+            f.write(f"{text.strip()}\n\n")
+    return srt_path
+
+def add_soft_captions(video_path, captions, output_path):
+    """Muxes captions as a selectable subtitle track without re-encoding the video."""
+    srt_path = os.path.join(app.config["TEMP_FOLDER"], f"captions_{uuid.uuid4().hex}.srt")
+    try:
+        write_srt(captions, srt_path)
+        return remux_video(video_path, output_path, subtitle_path=srt_path)
+    finally:
+        if os.path.exists(srt_path):
+            os.remove(srt_path)
+
+def overlay_captions(video_path, captions, output_path, encoder_params=None):
     """Overlays captions on the video."""
     try:
         clip = mp.VideoFileClip(video_path)
@@ -304,94 +566,495 @@ def overlay_captions(video_path, captions, output_path):
         subtitle_position = ('center', original_height - subtitle_margin)
 
         final_clip = mp.CompositeVideoClip([clip, subtitles.set_position(subtitle_position)])
-        final_clip.write_videofile(output_path, codec="libx264", audio_codec="aac")
+        write_clip(final_clip, output_path, "caption_overlay_encode", encoder_params)
 
         return output_path
     except Exception as e:
         print(f"Error overlaying captions: {e}")
         return None
 
+def run_pipeline(data, output_prefix="output", job_id=None):
+    """Runs the processing pipeline for one job. Returns the result dict, or None on failure."""
+    job_id = job_id or uuid.uuid4().hex
+    profile_path = None
+    if data.get("profile", False):
+        # Each profile is its own artifact in the temp folder, so the quota evicts old ones
+        profile_path = os.path.join(app.config["TEMP_FOLDER"], f"profile_{job_id}.prof")
+
+    # Wait for room in the CPU/memory budget before starting any heavy work
+    cores, memory_mb = estimate_job_cost(probe_video(data.get("file_path")), data)
+
+    result = None
+    with storage_manager.job(job_id):
+        # Reference the source before queueing, so it can't be evicted while the job waits for admission
+        storage_manager.track(data.get("file_path"), job_id=job_id)
+        with job_scheduler.admit(cores, memory_mb) as granted_cores:
+            if data.get("threads") is None:
+                data = dict(data, threads=granted_cores)
+
+            with metrics.track_job(), metrics.profile_job(profile_path is not None, profile_path) as profile_path:
+                try:
+                    result = run_pipeline_stages(data, output_prefix, job_id)
+                finally:
+                    metrics.inc_counter("pipeline_jobs_total", outcome="succeeded" if result else "failed")
+            # None when profiling was skipped because another job held the profiler
+            storage_manager.track(profile_path)
+
+    if result and profile_path:
+        result["profile_path"] = profile_path
+    if result:
+        result["download_url"] = get_download_url(result["output_path"])
+    return result
+
+def run_pipeline_stages(data, output_prefix, job_id):
+    """Runs each stage of the pipeline in turn: silence removal, captions, crop/resize and caption output."""
+    video_path = data.get("file_path")
+    format_type = data.get("format", "mp4")
+    aspect_ratio_str = data.get("aspect_ratio", "16:9")
+    auto_caption = data.get("auto_caption", False)
+    resolution_str = data.get("resolution", "100%")
+    use_face_tracking = data.get("use_face_tracking", False)
+    use_silence_removal = data.get("remove_silence", False)
+    caption_style = data.get("caption_style", "burn")
+    output_mode = data.get("output_mode", "file")
+    encoder_params = get_encoder_params(
+        data.get("quality", "standard"),
+        crf=data.get("crf"),
+        preset=data.get("preset"),
+        threads=data.get("threads"),
+        tune=data.get("tune")
+    )
+
+    if output_mode not in OUTPUT_MODES:
+        print(f"Unknown output mode: {output_mode}. Writing a regular file")
+        output_mode = "file"
+    if output_mode != "file":
+        # Subtitle tracks cannot be added to a stream while it is being written
+        caption_style = "burn"
+
+    source_path = video_path
+    keep_intervals = None
+
+    # Cut dead air first so every later stage works on the shorter clip
+    if use_silence_removal:
+        silence_path = os.path.join(app.config["TEMP_FOLDER"], f"silence_{uuid.uuid4().hex}.mp4")
+        trimmed_path, keep_intervals = remove_silence(
+            video_path,
+            silence_path,
+            encoder_params=get_encoder_params("draft", crf=INTERMEDIATE_CRF, threads=encoder_params["threads"])
+        )
+        if trimmed_path:
+            storage_manager.track(trimmed_path, job_id=job_id, intermediate=True)
+            video_path = trimmed_path
+
+    # Transcribe up front so we know which stage writes the final output
+    captions = None
+    if auto_caption:
+        captions = generate_captions(source_path)
+        if not isinstance(captions, list) or not captions:
+            captions = None
+        elif keep_intervals:
+            captions = remap_captions(captions, keep_intervals)
+
+    # Get original dimensions
+    cap = cv2.VideoCapture(video_path)
+    original_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    original_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+
+    # Calculate resolution percentage
+    resolution_percentage = float(resolution_str.replace("%", "")) / 100.0
+
+    # Calculate target dimensions (the job cost estimate uses the same sizes)
+    target_width, target_height = compute_resize_dimensions(
+        original_width,
+        original_height,
+        aspect_ratio_str,
+        resolution_percentage * 100
+    )
+
+    # Generate output paths
+    output_filename = f"{output_prefix}_{uuid.uuid4().hex}.{format_type}"
+    output_path = os.path.join(app.config["OUTPUT_FOLDER"], output_filename)
+    captioned_path = output_path.replace(f".{format_type}", f"_captioned.{format_type}")
+
+    stage_params = encoder_params
+    stage_output_mode = "file"
+    stream_path = None
+    if output_mode != "file":
+        job_id = job_id or uuid.uuid4().hex
+        stream_path = get_stream_path(job_id, output_mode)
+        if captions:
+            captioned_path = stream_path
+        else:
+            output_path = stream_path
+            stage_params = with_stream_output(encoder_params, stream_path, output_mode)
+            stage_output_mode = output_mode
+
+    if captions and caption_style != "soft":
+        # Burning in captions re-encodes the crop/resize output, so only that last write uses the job's tier
+        stage_params = get_encoder_params("draft", crf=INTERMEDIATE_CRF, threads=encoder_params["threads"])
+
+    processed_path = None
+
+    if use_face_tracking and yolo_model is not None:
+        processed_path = crop_video_to_face(
+            video_path,
+            output_path,
+            aspect_ratio_str,
+            target_width,
+            target_height,
+            encoder_params=stage_params
+        )
+    else:
+        processed_path = resize_video(
+            video_path,
+            output_path,
+            aspect_ratio_str,
+            resolution_percentage * 100,
+            encoder_params=stage_params,
+            output_mode=stage_output_mode,
+            # The silence-trimmed intermediate is near-lossless; it must be re-encoded at the job's tier
+            allow_remux=video_path == source_path
+        )
+
+    if not processed_path:
+        return None
+
+    storage_manager.track(processed_path, job_id=job_id)
+    result = {"output_path": processed_path}
+
+    # Handle captions
+    if captions:
+        if caption_style == "soft":
+            soft_path = add_soft_captions(processed_path, captions, captioned_path)
+            if soft_path is None:
+                # e.g. an .avi output or a stream playlist, which can't carry a subtitle track
+                print("Soft captions failed. Burning them in instead")
+                result["caption_style"] = "burn"
+                caption_style = "burn"
+            captioned_path = soft_path or captioned_path
+        if caption_style != "soft":
+            if stream_path:
+                encoder_params = with_stream_output(encoder_params, stream_path, output_mode)
+            captioned_path = overlay_captions(
+                processed_path,
+                captions,
+                captioned_path,
+                encoder_params=encoder_params
+            )
+        if captioned_path:
+            result["output_path"] = captioned_path
+            storage_manager.track(captioned_path, job_id=job_id)
+            # The uncaptioned render is only an intermediate now
+            if processed_path != captioned_path:
+                storage_manager.track(processed_path, job_id=job_id, intermediate=True)
+        else:
+            # The job still succeeds with the uncaptioned render, but says so
+            result["caption_error"] = "Failed to add captions"
+
+    if stream_path:
+        result["job_id"] = job_id
+        result["stream_url"] = f"/stream/{job_id}/{os.path.basename(stream_path)}"
+
+    return result
+
+# Streaming jobs run in the background; their state is kept here
+jobs = {}
+jobs_lock = threading.Lock()
+# Finished job records are kept this long (or until their output folder is evicted)
+JOB_RETENTION_SECONDS = int(os.environ.get("JOB_RETENTION_SECONDS", 24 * 3600))
+
+def run_background_job(job_id, data):
+    """Runs a pipeline job on a worker thread and records its outcome."""
+    try:
+        result = run_pipeline(data, job_id=job_id)
+        error = None if result else "Failed to process video"
+    except Exception as e:
+        result = None
+        error = str(e)
+
+    if not result:
+        # Don't leave the empty (or partly written) job folder behind
+        storage_manager.remove(os.path.abspath(os.path.join(app.config["OUTPUT_FOLDER"], job_id)))
+
+    with jobs_lock:
+        jobs[job_id].update(
+            status="done" if result else "failed",
+            result=result,
+            error=error,
+            finished_at=time.time()
+        )
+
+def expire_jobs():
+    """Drops records of jobs that finished longer ago than JOB_RETENTION_SECONDS."""
+    cutoff = time.time() - JOB_RETENTION_SECONDS
+    with jobs_lock:
+        expired = [
+            job_id for job_id, job in jobs.items()
+            if job["finished_at"] is not None and job["finished_at"] < cutoff
+        ]
+        for job_id in expired:
+            del jobs[job_id]
+
+def forget_evicted_job(path):
+    """Drops the record of a finished job once the storage manager evicts its folder."""
+    job_id = os.path.basename(path)
+    with jobs_lock:
+        job = jobs.get(job_id)
+        if job is not None and job["status"] != "running":
+            del jobs[job_id]
+
+storage_manager.on_evict = forget_evicted_job
+
+def is_streaming_request(data):
+    """Whether a job asks for an output that can be watched while it renders."""
+    output_mode = data.get("output_mode", "file")
+    return output_mode in OUTPUT_MODES and output_mode != "file"
+
+def start_streaming_job(data):
+    """Starts a streaming job in the background and returns where to follow it."""
+    expire_jobs()
+    job_id = uuid.uuid4().hex
+    stream_path = get_stream_path(job_id, data.get("output_mode"))
+    with jobs_lock:
+        jobs[job_id] = {"status": "running", "result": None, "error": None, "finished_at": None}
+    threading.Thread(target=run_background_job, args=(job_id, data), daemon=True).start()
+
+    return {
+        "job_id": job_id,
+        "status_url": f"/jobs/{job_id}",
+        "stream_url": f"/stream/{job_id}/{os.path.basename(stream_path)}"
+    }
+
+def get_job(job_id):
+    """Status of a background job, or None if it is unknown."""
+    with jobs_lock:
+        job = jobs.get(job_id)
+        return dict(job, job_id=job_id) if job is not None else None
+
 @app.route("/process_video", methods=["POST"])
 def process_video():
     """Processes video based on user selection."""
     data = request.json
     try:
-        video_path = data.get("file_path")
-        format_type = data.get("format", "mp4")
-        aspect_ratio_str = data.get("aspect_ratio", "16:9")
-        auto_caption = data.get("auto_caption", False)
-        resolution_str = data.get("resolution", "100%")
-        use_face_tracking = data.get("use_face_tracking", False)
-
-        # Get original dimensions
-        cap = cv2.VideoCapture(video_path)
-        original_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        original_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        cap.release()
+        # Streaming outputs return straight away so playback can start while the job renders
+        if is_streaming_request(data):
+            return jsonify(start_streaming_job(data)), 202
 
-        # Calculate resolution percentage
-        resolution_percentage = float(resolution_str.replace("%", "")) / 100.0
+        result = run_pipeline(data)
+        if not result:
+            return jsonify({"error": "Failed to process video"}), 500
 
-        # Parse aspect ratio and calculate target dimensions
-        aspect_ratio = parse_aspect_ratio(aspect_ratio_str)
-        if aspect_ratio:
-            ratio_w, ratio_h = aspect_ratio
-            target_ratio = ratio_w / ratio_h
-            new_width = int(original_width * resolution_percentage)
-            new_height = int(new_width * ratio_h / ratio_w)
-        else:
-            new_width = int(original_width * resolution_percentage)
-            new_height = int(original_height * resolution_percentage)
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        target_width = new_width
-        target_height = new_height
+def get_download_url(output_path):
+    """URL of the /download endpoint for a file inside the output folder."""
+    relative_path = os.path.relpath(output_path, app.config["OUTPUT_FOLDER"])
+    return f"/download/{relative_path.replace(os.sep, '/')}"
+
+@app.route("/download/<path:filename>", methods=["GET"])
+def download_output(filename):
+    """Serves a processed output with Range, ETag and Last-Modified support.
+
+    The file is streamed through the WSGI file wrapper (sendfile where the
+    server supports it), so seeking only transfers the requested byte range.
+    """
+    as_attachment = request.args.get("attachment", "0") == "1"
+    storage_manager.touch(os.path.join(app.config["OUTPUT_FOLDER"], filename))
+    return send_from_directory(
+        os.path.abspath(app.config["OUTPUT_FOLDER"]),
+        filename,
+        as_attachment=as_attachment,
+        conditional=True,
+        etag=True,
+        max_age=3600
+    )
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """Reports the status of a background streaming job."""
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job)
+
+@app.route("/stream/<job_id>/<path:filename>", methods=["GET"])
+def stream_output(job_id, filename):
+    """Serves the playlist, segments or fragmented MP4 of a streaming job while it is written."""
+    job_folder = os.path.join(app.config["OUTPUT_FOLDER"], secure_filename(job_id))
+    response = send_from_directory(os.path.abspath(job_folder), filename, conditional=True, max_age=0)
+    if filename.endswith(".m3u8"):
+        # The playlist keeps growing until the job finishes
+        response.headers["Cache-Control"] = "no-cache"
+    return response
+
+# Previews are rendered no taller than this
+PREVIEW_MAX_HEIGHT = 360
+
+def render_preview_source(video_path, output_path, preview_seconds=5, sample_count=0,
+                          max_height=PREVIEW_MAX_HEIGHT):
+    """Cuts the first seconds (or evenly spaced samples) of a video at low resolution with the draft encoder."""
+    try:
+        clip = mp.VideoFileClip(video_path)
+        preview_seconds = min(preview_seconds, clip.duration)
+
+        if sample_count > 1:
+            # Spread short segments across the whole video
+            segment_length = preview_seconds / sample_count
+            step = clip.duration / sample_count
+            segments = [
+                clip.subclip(i * step, min(i * step + segment_length, clip.duration))
+                for i in range(sample_count)
+            ]
+            preview_clip = concatenate_videoclips(segments)
+        else:
+            preview_clip = clip.subclip(0, preview_seconds)
 
-        # Generate output path
-        output_filename = f"output_{uuid.uuid4().hex}.{format_type}"
-        output_path = os.path.join(app.config["OUTPUT_FOLDER"], output_filename)
+        width, height = clip.size
+        if height > max_height:
+            # libx264 needs even dimensions
+            new_width = int(width * max_height / height) // 2 * 2
+            preview_clip = preview_clip.resize(newsize=(new_width, max_height))
 
-        processed_path = None
+        write_clip(preview_clip, output_path, "preview_encode", get_encoder_params("draft"))
+        return output_path
+    except Exception as e:
+        print(f"Error rendering preview: {e}")
+        return None
 
-        if use_face_tracking and yolo_model is not None:
-            processed_path = crop_video_to_face(
-                video_path,
-                output_path,
-                aspect_ratio_str,
-                target_width,
-                target_height
-            )
-        else:
-            processed_path = resize_video(
-                video_path,
-                output_path,
-                aspect_ratio_str,
-                resolution_percentage * 100
-            )
+def grab_keyframe(video_path, timestamp, thumb_width, thumb_height):
+    """Seeks to the keyframe nearest a timestamp and decodes just that frame, scaled to the thumbnail size.
+
+    Returns (frame, frame_time): the keyframe usually sits before the requested
+    timestamp, so its own time is read back from ffmpeg's showinfo filter.
+    """
+    command = [
+        get_setting("FFMPEG_BINARY"), "-hide_banner", "-loglevel", "info", "-nostats",
+        "-noaccurate_seek", "-ss", f"{timestamp:.3f}", "-copyts", "-i", video_path,
+        "-frames:v", "1", "-vf", f"showinfo,scale={thumb_width}:{thumb_height}",
+        "-f", "rawvideo", "-pix_fmt", "bgr24", "-"
+    ]
+    process = subprocess.run(command, check=True, capture_output=True)
+    expected_size = thumb_width * thumb_height * 3
+    if len(process.stdout) < expected_size:
+        return None, None
+    frame = np.frombuffer(process.stdout[:expected_size], dtype=np.uint8).reshape(thumb_height, thumb_width, 3)
+
+    # -copyts keeps the source timestamps, so pts_time is the frame's position in the video
+    match = re.search(r"pts_time:\s*(-?[\d.]+)", process.stderr.decode(errors="replace"))
+    frame_time = float(match.group(1)) if match else timestamp
+    return frame, frame_time
+
+def generate_thumbnail_strip(video_path, output_path, count=10, thumb_width=160):
+    """Builds a horizontal sprite sheet of thumbnails spaced evenly through the video."""
+    try:
+        info = probe_video(video_path)
+        if info["duration"] <= 0 or info["width"] == 0:
+            print("Could not determine video duration for thumbnails")
+            return None, []
+
+        thumb_height = int(thumb_width * info["height"] / info["width"]) // 2 * 2
+        timestamps = [info["duration"] * (i + 0.5) / count for i in range(count)]
+
+        thumbnails = []
+        times = []
+        for timestamp in timestamps:
+            frame, frame_time = grab_keyframe(video_path, timestamp, thumb_width, thumb_height)
+            if frame is not None:
+                thumbnails.append(frame)
+                times.append(frame_time)
+
+        if not thumbnails:
+            print("No thumbnails could be extracted")
+            return None, []
+
+        cv2.imwrite(output_path, np.hstack(thumbnails))
+        tiles = [
+            {"time": timestamp, "x": i * thumb_width, "width": thumb_width, "height": thumb_height}
+            for i, timestamp in enumerate(times)
+        ]
+        return output_path, tiles
+    except Exception as e:
+        print(f"Error generating thumbnail strip: {e}")
+        return None, []
 
-        if not processed_path:
-            return jsonify({"error": "Failed to process video"}), 500
+def run_preview(data):
+    """Renders a preview job. Returns (result, error)."""
+    video_path = data.get("file_path")
+    preview_seconds = float(data.get("preview_seconds", 5))
+    sample_count = int(data.get("sample_count", 0))
 
-        result = {"output_path": processed_path}
+    preview_source = os.path.join(app.config["TEMP_FOLDER"], f"preview_source_{uuid.uuid4().hex}.mp4")
+    if not render_preview_source(video_path, preview_source, preview_seconds, sample_count):
+        return None, "Failed to render preview"
 
-        # Handle captions
-        if auto_caption:
-            captions = generate_captions(video_path)
-            if captions and isinstance(captions, list):
-                captioned_path = processed_path.replace(f".{format_type}", f"_captioned.{format_type}")
-                overlay_captions(processed_path, captions, captioned_path)
-                result["output_path"] = captioned_path
+    # Run the same pipeline on the short clip, always with the draft encoder
+    preview_data = dict(data, file_path=preview_source, quality="draft", output_mode="file")
+    try:
+        result = run_pipeline(preview_data, output_prefix="preview")
+    finally:
+        storage_manager.remove(os.path.abspath(preview_source))
+    if not result:
+        return None, "Failed to process preview"
+
+    if data.get("thumbnails", True):
+        strip_path = os.path.join(app.config["OUTPUT_FOLDER"], f"thumbnails_{uuid.uuid4().hex}.jpg")
+        strip_path, tiles = generate_thumbnail_strip(
+            video_path,
+            strip_path,
+            count=int(data.get("thumbnail_count", 10))
+        )
+        result["thumbnail_strip"] = strip_path
+        storage_manager.track(strip_path)
+        if strip_path:
+            result["thumbnail_strip_url"] = get_download_url(strip_path)
+        result["thumbnails"] = tiles
+
+    return result, None
+
+@app.route("/preview_video", methods=["POST"])
+def preview_video():
+    """Renders a fast low-resolution preview of the requested processing, plus a thumbnail strip."""
+    data = request.json
+    try:
+        result, error = run_preview(data)
+        if error:
+            return jsonify({"error": error}), 500
 
         return jsonify(result)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/scheduler", methods=["GET"])
+def scheduler_status():
+    """Reports how much of the CPU/memory budget running jobs are using."""
+    return jsonify(job_scheduler.status())
+
+@app.route("/storage", methods=["GET"])
+def storage_status():
+    """Reports disk usage of each managed folder against its quota."""
+    return jsonify(storage_manager.status())
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Exposes pipeline stage timings and counters in Prometheus text format."""
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+def get_available_features():
+    """Which optional features the loaded models support."""
+    return {
+        "face_tracking_available": yolo_model is not None,
+        "auto_caption_available": stt_model is not None,
+        "quality_tiers": list(ENCODER_TIERS)
+    }
+
 @app.route("/available_features", methods=["GET"])
 def available_features():
     """Returns available features status."""
-    return jsonify({
-        "face_tracking_available": yolo_model is not None,
-        "auto_caption_available": stt_model is not None
-    })
+    return jsonify(get_available_features())
 
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,229 @@
+"""Processes whole directories (or a manifest) of videos without the Flask server.
+
+Models are loaded once when backend is imported, jobs run concurrently on a
+thread pool (still subject to the backend's CPU/memory admission control),
+and the most expensive jobs are started first. Every finished job is
+appended to a progress file, so re-running the same command after an
+interruption skips the work that is already done.
+
+    python batch.py videos/ --output-dir shorts/ --aspect-ratio 9:16 --face-tracking
+    python batch.py manifest.jsonl --specs specs.json --output-dir out/ --workers 4
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import backend
+from scheduler import estimate_job_cost
+
+def find_inputs(source):
+    """Lists the videos in a directory (recursively) or the entries of a JSON/JSONL manifest.
+
+    Each input is a dict with at least file_path; manifest entries may also
+    carry per-file processing options.
+    """
+    if os.path.isdir(source):
+        inputs = []
+        for root, _, names in os.walk(source):
+            for name in sorted(names):
+                if backend.allowed_file(name):
+                    inputs.append({"file_path": os.path.join(root, name)})
+        return sorted(inputs, key=lambda entry: entry["file_path"])
+
+    with open(source) as f:
+        if source.endswith(".jsonl"):
+            entries = [json.loads(line) for line in f if line.strip()]
+        else:
+            entries = json.load(f)
+    return [{"file_path": entry} if isinstance(entry, str) else entry for entry in entries]
+
+def load_specs(args):
+    """Output specs from --specs, or a single spec built from the command-line options."""
+    if args.specs:
+        with open(args.specs) as f:
+            specs = json.load(f)
+        specs = specs if isinstance(specs, list) else [specs]
+
+        # The spec name is part of the output filename, so it must be unique
+        names = [spec.get("name", "output") for spec in specs]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise SystemExit(f"Spec names must be unique; duplicated: {', '.join(duplicates)}")
+        return specs
+
+    return [{
+        "name": args.aspect_ratio.replace(":", "x"),
+        "format": args.format,
+        "aspect_ratio": args.aspect_ratio,
+        "resolution": args.resolution,
+        "quality": args.quality,
+        "use_face_tracking": args.face_tracking,
+        "auto_caption": args.auto_caption,
+        "remove_silence": args.remove_silence,
+    }]
+
+def task_key(entry, spec):
+    """Stable identifier of one input/spec pair, used to resume interrupted batches."""
+    key = {"file_path": os.path.abspath(entry["file_path"]), "spec": spec}
+    options = {name: value for name, value in entry.items() if name != "file_path"}
+    if options:
+        # Manifests may list the same file more than once with different options
+        key["options"] = options
+    payload = json.dumps(key, sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+def load_progress(progress_path):
+    """Keys of the tasks a previous run already finished."""
+    done = set()
+    if not os.path.exists(progress_path):
+        return done
+    with open(progress_path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by an interruption
+                continue
+            if record.get("status") == "done":
+                done.add(record["key"])
+    return done
+
+def build_tasks(inputs, specs, done):
+    """Pairs every input with every spec, skipping finished pairs, most expensive first."""
+    if not inputs:
+        return []
+
+    # Outputs mirror the inputs' directory layout below their common root
+    input_root = os.path.commonpath([os.path.dirname(os.path.abspath(entry["file_path"])) for entry in inputs])
+    names_taken = set()
+
+    tasks = []
+    for entry in inputs:
+        info = None
+        for spec in specs:
+            data = dict(spec, **entry)
+            data.pop("name", None)
+            key = task_key(entry, spec)
+            name = output_name(entry["file_path"], input_root, spec.get("name", "output"), data.get("format", "mp4"))
+            if name in names_taken:
+                # Same stem and spec in one folder (clip.mp4 and clip.mov, or repeated manifest entries)
+                stem, extension = os.path.splitext(name)
+                name = f"{stem}_{key[:8]}{extension}"
+            names_taken.add(name)
+            if key in done:
+                continue
+
+            info = info or backend.probe_video(entry["file_path"])
+
+            cores, _ = estimate_job_cost(info, data)
+            # Longest jobs first keeps the pool busy until the very end of the batch
+            cost = info["frame_count"] * info["width"] * info["height"] * cores
+            tasks.append({"key": key, "spec": spec, "data": data, "cost": cost, "output_name": name})
+    return sorted(tasks, key=lambda task: task["cost"], reverse=True)
+
+def output_name(file_path, input_root, spec_name, extension):
+    """Output path relative to the output directory, keeping the input's subdirectory."""
+    relative_dir = os.path.relpath(os.path.dirname(os.path.abspath(file_path)), input_root)
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.normpath(os.path.join(relative_dir, f"{stem}_{spec_name}.{extension}"))
+
+def run_task(task, output_dir):
+    """Runs one job through the backend pipeline and moves its result into the output directory."""
+    start = time.perf_counter()
+    try:
+        result = backend.run_pipeline(dict(task["data"], output_mode="file"))
+        if not result:
+            raise RuntimeError("Failed to process video")
+
+        destination = os.path.join(output_dir, task["output_name"])
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        shutil.move(result["output_path"], destination)
+        return {"status": "done", "output": destination, "error": None, "wall_time": time.perf_counter() - start}
+    except Exception as e:
+        return {"status": "failed", "output": None, "error": str(e), "wall_time": time.perf_counter() - start}
+
+def record_outcome(progress, task, outcome):
+    """Appends a finished task to the progress file and prints it."""
+    record = dict(outcome, key=task["key"], input=task["data"]["file_path"], spec=task["spec"])
+    progress.write(json.dumps(record) + "\n")
+    progress.flush()
+    print(f"{outcome['status']:<6} {record['input']} "
+          f"({outcome['wall_time']:.1f}s){' - ' + outcome['error'] if outcome['error'] else ''}")
+
+def run_batch(tasks, output_dir, progress_path, workers):
+    """Runs tasks on a thread pool, appending each outcome to the progress file as it finishes."""
+    os.makedirs(output_dir, exist_ok=True)
+    failed = 0
+    finished = set()
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+    with open(progress_path, "a") as progress:
+        futures = {pool.submit(run_task, task, output_dir): task for task in tasks}
+        try:
+            for completed, future in enumerate(as_completed(futures), start=1):
+                finished.add(future)
+                outcome = future.result()
+                if outcome["status"] != "done":
+                    failed += 1
+                print(f"[{completed}/{len(tasks)}] ", end="")
+                record_outcome(progress, futures[future], outcome)
+        except KeyboardInterrupt:
+            # Drop the queued tasks, but let the running ones finish and record them so
+            # the next run doesn't redo them
+            pool.shutdown(wait=False, cancel_futures=True)
+            running = [future for future in futures if future not in finished and not future.cancelled()]
+            print(f"Interrupted: waiting for {len(running)} running tasks to finish")
+            for future in as_completed(running):
+                record_outcome(progress, futures[future], future.result())
+            raise
+        finally:
+            pool.shutdown(wait=True)
+            # Results were moved out of the output folder, so drop them from the storage index
+            backend.storage_manager.scan()
+
+    return failed
+
+def main():
+    parser = argparse.ArgumentParser(description="Process a directory or manifest of videos without the server.")
+    parser.add_argument("source", help="directory of videos, or a .json/.jsonl manifest")
+    parser.add_argument("--output-dir", required=True, help="where finished videos are written")
+    parser.add_argument("--progress", help="progress file used to resume (default: <output-dir>/batch_progress.jsonl)")
+    parser.add_argument("--specs", help="JSON file with a list of output specs (overrides the options below)")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--format", default="mp4")
+    parser.add_argument("--aspect-ratio", default="9:16")
+    parser.add_argument("--resolution", default="100%")
+    parser.add_argument("--quality", default="standard", choices=list(backend.ENCODER_TIERS))
+    parser.add_argument("--face-tracking", action="store_true")
+    parser.add_argument("--auto-caption", action="store_true")
+    parser.add_argument("--remove-silence", action="store_true")
+    args = parser.parse_args()
+
+    progress_path = args.progress or os.path.join(args.output_dir, "batch_progress.jsonl")
+    os.makedirs(os.path.dirname(os.path.abspath(progress_path)), exist_ok=True)
+
+    inputs = find_inputs(args.source)
+    specs = load_specs(args)
+    done = load_progress(progress_path)
+    tasks = build_tasks(inputs, specs, done)
+
+    print(f"{len(inputs)} inputs x {len(specs)} specs: {len(done)} already done, {len(tasks)} to run")
+    if not tasks:
+        return
+
+    try:
+        failed = run_batch(tasks, args.output_dir, progress_path, args.workers)
+    except KeyboardInterrupt:
+        raise SystemExit("Interrupted: re-run the same command to resume")
+    print(f"Finished: {len(tasks) - failed} succeeded, {failed} failed")
+    if failed:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
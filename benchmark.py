@@ -0,0 +1,236 @@
+"""Benchmarks each stage of the backend pipeline on synthetic test videos.
+
+Clips are generated locally with ffmpeg's testsrc/sine sources, so runs are
+reproducible on any machine. Results are written to a JSON file that can be
+compared against an earlier run:
+
+    python benchmark.py --output bench_before.json
+    python benchmark.py --output bench_after.json
+    python benchmark.py --compare bench_before.json bench_after.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+
+from moviepy.config import get_setting
+
+import backend
+
+# (width, height) pairs covering landscape, portrait and square sources
+RESOLUTIONS = [(640, 360), (1280, 720), (1920, 1080), (1080, 1920), (720, 720)]
+DURATIONS = [5, 15]
+QUICK_RESOLUTIONS = [(640, 360), (360, 640)]
+QUICK_DURATIONS = [3]
+
+FRAME_RATE = 30
+SAMPLE_CAPTIONS = [((0.0, 1.5), "Benchmark caption one"), ((1.5, 3.0), "Benchmark caption two")]
+
+def generate_clip(path, width, height, duration, with_audio=True):
+    """Renders a synthetic test clip with ffmpeg's testsrc (and a sine tone for audio)."""
+    command = [
+        get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc=size={width}x{height}:rate={FRAME_RATE}:duration={duration}",
+    ]
+    if with_audio:
+        command += ["-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=44100:duration={duration}"]
+        command += ["-c:a", "aac"]
+    command += ["-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", "-shortest", path]
+    subprocess.run(command, check=True)
+    return path
+
+def peak_rss_mb():
+    """Peak resident memory of this process and its ffmpeg children, in MB."""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / 1024
+
+def run_stage(stage, clip_path, output_path, quality):
+    """Runs a single pipeline stage. Returns the path it produced, or None."""
+    encoder_params = backend.get_encoder_params(quality)
+
+    if stage == "resize_video":
+        return backend.resize_video(clip_path, output_path, "9:16", 50, encoder_params=encoder_params)
+    if stage == "crop_video_to_face":
+        info = backend.probe_video(clip_path)
+        target_height = info["height"] // 2 * 2
+        target_width = int(target_height * 9 / 16) // 2 * 2
+        return backend.crop_video_to_face(
+            clip_path,
+            output_path,
+            "9:16",
+            target_width,
+            target_height,
+            encoder_params=encoder_params
+        )
+    if stage == "generate_captions":
+        captions = backend.generate_captions(clip_path)
+        return clip_path if isinstance(captions, list) else None
+    if stage == "overlay_captions":
+        return backend.overlay_captions(clip_path, SAMPLE_CAPTIONS, output_path, encoder_params=encoder_params)
+    if stage == "process_video":
+        client = backend.app.test_client()
+        response = client.post("/process_video", json={
+            "file_path": clip_path,
+            "aspect_ratio": "9:16",
+            "resolution": "50%",
+            "auto_caption": backend.stt_model is not None,
+            "use_face_tracking": backend.yolo_model is not None,
+            "quality": quality
+        })
+        return response.get_json().get("output_path") if response.status_code == 200 else None
+    raise ValueError(f"Unknown stage: {stage}")
+
+def measure_stage(connection, stage, clip_path, output_path, quality):
+    """Worker process body: times one stage and sends the measurement back to the parent."""
+    start = time.perf_counter()
+    try:
+        produced = run_stage(stage, clip_path, output_path, quality)
+        error = None if produced else "stage returned no output"
+    except Exception as e:
+        produced = None
+        error = str(e)
+    wall_time = time.perf_counter() - start
+
+    connection.send({"produced": produced, "wall_time": wall_time, "peak_rss_mb": peak_rss_mb(), "error": error})
+    connection.close()
+
+def benchmark_stage(stage, clip_name, clip_path, info, quality, work_dir):
+    """Times a stage in a fresh process so peak RSS is not shared between measurements."""
+    output_path = os.path.join(work_dir, f"{clip_name}_{stage}_{quality}.mp4")
+    parent_connection, child_connection = multiprocessing.Pipe(duplex=False)
+    worker = multiprocessing.Process(
+        target=measure_stage,
+        args=(child_connection, stage, clip_path, output_path, quality)
+    )
+    worker.start()
+    # Drop the parent's copy of the write end so a crashed worker shows up as EOF
+    child_connection.close()
+    try:
+        measurement = parent_connection.recv()
+    except EOFError:
+        worker.join()
+        measurement = {
+            "produced": None,
+            "wall_time": 0,
+            "peak_rss_mb": 0,
+            "error": f"worker exited with code {worker.exitcode} before reporting"
+        }
+    worker.join()
+
+    record = {
+        "clip": clip_name,
+        "stage": stage,
+        "quality": quality,
+        "width": info["width"],
+        "height": info["height"],
+        "duration": info["duration"],
+        "wall_time": round(measurement["wall_time"], 3),
+        "fps": round(info["frame_count"] / measurement["wall_time"], 2) if measurement["wall_time"] else None,
+        "peak_rss_mb": round(measurement["peak_rss_mb"], 1),
+        "ok": measurement["error"] is None,
+        "error": measurement["error"],
+    }
+
+    produced = measurement["produced"]
+    if produced and produced != clip_path and os.path.isfile(produced):
+        size_bytes = os.path.getsize(produced)
+        output_duration = backend.probe_video(produced)["duration"] or info["duration"]
+        record["output_bytes"] = size_bytes
+        record["output_bitrate_kbps"] = round(size_bytes * 8 / output_duration / 1000, 1)
+
+    # Full pipeline runs write into the backend's output folder rather than work_dir
+    output_folder = os.path.abspath(backend.app.config["OUTPUT_FOLDER"])
+    if produced and os.path.commonpath([output_folder, os.path.abspath(produced)]) == output_folder:
+        backend.storage_manager.remove(backend.storage_manager.artifact_path(produced))
+
+    status = "ok" if record["ok"] else f"FAILED ({record['error']})"
+    print(f"{clip_name:<28} {stage:<20} {quality:<9} {record['wall_time']:>8.2f}s {str(record['fps']):>8} fps  {status}")
+    return record
+
+def run_benchmarks(quick=False, tiers=None, stages=None):
+    """Generates the synthetic clips and benchmarks every stage on each of them."""
+    resolutions = QUICK_RESOLUTIONS if quick else RESOLUTIONS
+    durations = QUICK_DURATIONS if quick else DURATIONS
+    tiers = tiers or list(backend.ENCODER_TIERS)
+    stages = stages or ["resize_video", "crop_video_to_face", "generate_captions", "overlay_captions", "process_video"]
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench_") as work_dir:
+        for width, height in resolutions:
+            for duration in durations:
+                for with_audio in (True, False):
+                    clip_name = f"{width}x{height}_{duration}s_{'audio' if with_audio else 'silent'}"
+                    clip_path = generate_clip(
+                        os.path.join(work_dir, f"{clip_name}.mp4"),
+                        width,
+                        height,
+                        duration,
+                        with_audio
+                    )
+                    info = backend.probe_video(clip_path)
+
+                    for stage in stages:
+                        if stage == "crop_video_to_face" and backend.yolo_model is None:
+                            continue
+                        if stage == "generate_captions" and (backend.stt_model is None or not with_audio):
+                            continue
+
+                        # Encoder tiers only matter to stages that write video
+                        stage_tiers = ["standard"] if stage == "generate_captions" else tiers
+                        for quality in stage_tiers:
+                            results.append(benchmark_stage(stage, clip_name, clip_path, info, quality, work_dir))
+
+    # Workers updated the storage index on their own; drop entries for the files removed above
+    backend.storage_manager.scan()
+    return results
+
+def compare_runs(before_path, after_path):
+    """Prints the wall-time and fps change of every measurement present in both runs."""
+    with open(before_path) as f:
+        before = {(r["clip"], r["stage"], r["quality"]): r for r in json.load(f)["results"]}
+    with open(after_path) as f:
+        after = {(r["clip"], r["stage"], r["quality"]): r for r in json.load(f)["results"]}
+
+    print(f"{'clip':<28} {'stage':<20} {'quality':<9} {'before':>9} {'after':>9} {'change':>8}")
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key], after[key]
+        if not (old["ok"] and new["ok"]):
+            continue
+        change = (new["wall_time"] - old["wall_time"]) / old["wall_time"] * 100
+        print(f"{key[0]:<28} {key[1]:<20} {key[2]:<9} {old['wall_time']:>8.2f}s {new['wall_time']:>8.2f}s {change:>+7.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the video processing pipeline on synthetic clips.")
+    parser.add_argument("--output", default="bench_output.json", help="where to write the JSON results")
+    parser.add_argument("--quick", action="store_true", help="run a small clip matrix")
+    parser.add_argument("--tiers", nargs="+", choices=list(backend.ENCODER_TIERS), help="encoder tiers to measure")
+    parser.add_argument("--stages", nargs="+", help="only run these stages")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_runs(*args.compare)
+        return
+
+    results = run_benchmarks(quick=args.quick, tiers=args.tiers, stages=args.stages)
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(results)} measurements to {args.output}")
+
+if __name__ == "__main__":
+    # Fork so workers share the models loaded by the parent instead of reloading them
+    multiprocessing.set_start_method("fork")
+    main()
@@ -0,0 +1,24 @@
+"""Output frame sizes, shared by the pipeline and the job cost estimator."""
+import re
+
+def parse_aspect_ratio(aspect_ratio_str):
+    """Parse an aspect ratio string like '16:9' into a tuple of integers."""
+    match = re.match(r'(\d+):(\d+)', aspect_ratio_str or "")
+    if match:
+        return (int(match.group(1)), int(match.group(2)))
+    return None
+
+def compute_resize_dimensions(original_width, original_height, aspect_ratio_str, resolution_percentage):
+    """Calculates the output size for a resize from the original size, aspect ratio and percentage."""
+    scale_factor = resolution_percentage / 100
+    new_width = int(original_width * scale_factor)
+    new_height = int(original_height * scale_factor)
+
+    # Adjust aspect ratio if provided
+    aspect_ratio = parse_aspect_ratio(aspect_ratio_str)
+    if aspect_ratio:
+        aspect_w, aspect_h = aspect_ratio
+        if (new_width / new_height) != (aspect_w / aspect_h):
+            new_height = int(new_width * aspect_h / aspect_w)
+
+    return new_width, new_height
@@ -0,0 +1,125 @@
+"""Load test: latency of the light endpoints while heavy jobs are running.
+
+Uploads a synthetic clip, keeps a number of /process_video jobs running
+back to back, and meanwhile hammers /available_features and /get_resolution.
+Prints p50/p95/p99 latency per endpoint so the Flask and ASGI servers can be
+compared:
+
+    uvicorn asgi:app --port 5000 &
+    python loadtest.py --url http://127.0.0.1:5000 --heavy 4 --light 32 --duration 60
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import tempfile
+import time
+
+import httpx
+import numpy as np
+from imageio_ffmpeg import get_ffmpeg_exe
+
+def generate_clip(path, width=1280, height=720, duration=10):
+    """Renders a synthetic test clip with ffmpeg's testsrc and a sine tone."""
+    subprocess.run([
+        get_ffmpeg_exe(), "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc=size={width}x{height}:rate=30:duration={duration}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", "-c:a", "aac", "-shortest", path
+    ], check=True)
+    return path
+
+async def upload_clip(client, clip_path):
+    """Streams the clip to /upload as a raw body and returns its server-side path."""
+    async def chunks():
+        with open(clip_path, "rb") as f:
+            while chunk := f.read(1024 * 1024):
+                yield chunk
+
+    response = await client.post(
+        "/upload",
+        params={"filename": os.path.basename(clip_path)},
+        content=chunks(),
+        headers={"content-type": "application/octet-stream"}
+    )
+    if response.status_code == 400:
+        # Flask only accepts multipart uploads
+        with open(clip_path, "rb") as f:
+            response = await client.post("/upload", files={"file": (os.path.basename(clip_path), f)})
+    response.raise_for_status()
+    return response.json()["file_path"]
+
+async def heavy_worker(client, file_path, deadline, latencies):
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        await client.post("/process_video", json={
+            "file_path": file_path,
+            "aspect_ratio": "9:16",
+            "resolution": "50%",
+            "quality": "draft"
+        }, timeout=None)
+        latencies.append(time.perf_counter() - start)
+
+async def light_worker(client, file_path, deadline, latencies):
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        await client.get("/available_features")
+        latencies["/available_features"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await client.post("/get_resolution", json={"file_path": file_path})
+        latencies["/get_resolution"].append(time.perf_counter() - start)
+
+def summarize(samples):
+    if not samples:
+        return {"count": 0}
+    values = np.array(samples) * 1000
+    return {
+        "count": len(samples),
+        "p50_ms": round(float(np.percentile(values, 50)), 1),
+        "p95_ms": round(float(np.percentile(values, 95)), 1),
+        "p99_ms": round(float(np.percentile(values, 99)), 1),
+        "max_ms": round(float(values.max()), 1),
+    }
+
+async def run_load_test(url, heavy, light, duration):
+    limits = httpx.Limits(max_connections=heavy + light + 4)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=120) as client:
+        with tempfile.TemporaryDirectory(prefix="loadtest_") as work_dir:
+            clip_path = generate_clip(os.path.join(work_dir, "loadtest.mp4"))
+            start = time.perf_counter()
+            file_path = await upload_clip(client, clip_path)
+            upload_seconds = time.perf_counter() - start
+
+        deadline = time.monotonic() + duration
+        heavy_latencies = []
+        light_latencies = {"/available_features": [], "/get_resolution": []}
+        await asyncio.gather(
+            *(heavy_worker(client, file_path, deadline, heavy_latencies) for _ in range(heavy)),
+            *(light_worker(client, file_path, deadline, light_latencies) for _ in range(light)),
+        )
+
+    report = {"url": url, "heavy_clients": heavy, "light_clients": light, "duration": duration,
+              "upload_seconds": round(upload_seconds, 3), "/process_video": summarize(heavy_latencies)}
+    for endpoint, samples in light_latencies.items():
+        report[endpoint] = summarize(samples)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure light-endpoint latency under heavy processing load.")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--heavy", type=int, default=4, help="concurrent /process_video clients")
+    parser.add_argument("--light", type=int, default=32, help="concurrent light-endpoint clients")
+    parser.add_argument("--duration", type=float, default=60, help="seconds to keep the load running")
+    parser.add_argument("--output", help="also write the report to this JSON file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_load_test(args.url, args.heavy, args.light, args.duration))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Lightweight stage timers, counters and histograms for the video pipeline.
+
+Everything is kept in process memory and rendered in the Prometheus text
+exposition format by render_prometheus(), which backs the /metrics endpoint.
+"""
+import cProfile
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the stage duration histogram buckets
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+METRIC_HELP = {
+    "pipeline_stage_seconds": ("histogram", "Wall time spent in each pipeline stage."),
+    "pipeline_frames_total": ("counter", "Video frames handled by each pipeline stage."),
+    "pipeline_media_seconds_total": ("counter", "Seconds of media handled by each pipeline stage."),
+    "pipeline_bytes_written_total": ("counter", "Bytes written by each pipeline stage."),
+    "pipeline_cache_hits_total": ("counter", "Work skipped by reusing an existing result or fast path."),
+    "pipeline_jobs_total": ("counter", "Pipeline jobs finished, by outcome."),
+    "pipeline_jobs_in_progress": ("gauge", "Pipeline jobs currently running."),
+    "pipeline_queue_depth": ("gauge", "Jobs waiting to start."),
+}
+
+_lock = threading.Lock()
+_profile_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_gauges = {}
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+def observe(name, value, **labels):
+    """Records a value in a histogram."""
+    key = (name, _label_key(labels))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {"buckets": [0] * len(STAGE_BUCKETS), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(STAGE_BUCKETS):
+            if value <= bound:
+                histogram["buckets"][i] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+def inc_counter(name, value=1, **labels):
+    """Adds to a counter."""
+    key = (name, _label_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def add_gauge(name, value, **labels):
+    """Moves a gauge up or down."""
+    key = (name, _label_key(labels))
+    with _lock:
+        _gauges[key] = _gauges.get(key, 0) + value
+
+def set_gauge(name, value, **labels):
+    """Sets a gauge to an absolute value."""
+    with _lock:
+        _gauges[(name, _label_key(labels))] = value
+
+def record_stage(stage, seconds, frames=0, media_seconds=0.0, bytes_written=0):
+    """Records the duration and throughput of one run of a pipeline stage."""
+    observe("pipeline_stage_seconds", seconds, stage=stage)
+    if frames:
+        inc_counter("pipeline_frames_total", frames, stage=stage)
+    if media_seconds:
+        inc_counter("pipeline_media_seconds_total", media_seconds, stage=stage)
+    if bytes_written:
+        inc_counter("pipeline_bytes_written_total", bytes_written, stage=stage)
+
+@contextmanager
+def stage_timer(stage):
+    """Times the enclosed block as one run of a stage.
+
+    The yielded dict can be filled in with frames, media_seconds and
+    bytes_written before the block exits.
+    """
+    stats = {"frames": 0, "media_seconds": 0.0, "bytes_written": 0}
+    start = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        record_stage(stage, time.perf_counter() - start, **stats)
+
+@contextmanager
+def track_job():
+    """Counts a job as in progress while the enclosed block runs."""
+    add_gauge("pipeline_jobs_in_progress", 1)
+    try:
+        yield
+    finally:
+        add_gauge("pipeline_jobs_in_progress", -1)
+
+@contextmanager
+def profile_job(enabled, profile_path):
+    """Runs the enclosed block under cProfile and dumps the stats to profile_path when enabled."""
+    if not enabled:
+        yield None
+        return
+
+    # Only one cProfile profiler can be active at a time (enable() raises on Python 3.12+)
+    if not _profile_lock.acquire(blocking=False):
+        print("Another job is being profiled. Running this one without the profiler")
+        yield None
+        return
+
+    try:
+        os.makedirs(os.path.dirname(profile_path), exist_ok=True)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield profile_path
+        finally:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+    finally:
+        _profile_lock.release()
+
+def render_prometheus():
+    """Renders every metric in the Prometheus text exposition format."""
+    with _lock:
+        histograms = {key: dict(value, buckets=list(value["buckets"])) for key, value in _histograms.items()}
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+
+    samples = {}
+    for (name, label_key), histogram in histograms.items():
+        lines = samples.setdefault(name, [])
+        for bound, count in zip(STAGE_BUCKETS, histogram["buckets"]):
+            lines.append(f"{name}_bucket{_format_labels(label_key, [('le', bound)])} {count}")
+        lines.append(f"{name}_bucket{_format_labels(label_key, [('le', '+Inf')])} {histogram['count']}")
+        lines.append(f"{name}_sum{_format_labels(label_key)} {histogram['sum']}")
+        lines.append(f"{name}_count{_format_labels(label_key)} {histogram['count']}")
+    for values in (counters, gauges):
+        for (name, label_key), value in values.items():
+            samples.setdefault(name, []).append(f"{name}{_format_labels(label_key)} {value}")
+
+    output = []
+    for name in sorted(samples):
+        metric_type, help_text = METRIC_HELP.get(name, ("untyped", name))
+        output.append(f"# HELP {name} {help_text}")
+        output.append(f"# TYPE {name} {metric_type}")
+        output.extend(samples[name])
+    return "\n".join(output) + "\n"
@@ -0,0 +1,150 @@
+"""Admission control for pipeline jobs.
+
+Each job's CPU and memory cost is estimated from the probed video and the
+requested features. Jobs only start while the running set fits inside the
+configured budget; the rest wait in FIFO order. Thread pools that are
+process-wide (torch, OpenCV) are split evenly between the running jobs,
+and each job's ffmpeg encoder gets the cores it was granted.
+"""
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+import metrics
+from geometry import compute_resize_dimensions
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+# Rough resident sizes of the loaded models and per-job overhead, in MB
+BASE_JOB_MEMORY_MB = 300
+YOLO_MEMORY_MB = 500
+WHISPER_MEMORY_MB = 1000
+# Frames moviepy/ffmpeg keep buffered while decoding and encoding
+BUFFERED_FRAMES = 8
+
+def total_memory_mb():
+    """Physical memory of the machine in MB, or None if it cannot be read."""
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+def estimate_job_cost(info, data):
+    """Estimates the (cores, memory_mb) a job needs from its probed video info and requested features.
+
+    Stages run one after another, so the job's cost is that of its most
+    expensive stage rather than the sum.
+    """
+    width, height = info["width"], info["height"]
+    resolution_percentage = float(str(data.get("resolution", "100%")).replace("%", ""))
+    # Same output size the pipeline computes; a 9:16 crop of a 16:9 source is taller than the source
+    target_width, target_height = compute_resize_dimensions(
+        width,
+        height,
+        data.get("aspect_ratio", "16:9"),
+        resolution_percentage
+    )
+    target_frame_mb = target_width * target_height * 3 / (1024 * 1024)
+    frame_mb = max(width * height * 3 / (1024 * 1024), target_frame_mb)
+    pixels = max(width * height, target_width * target_height)
+
+    # libx264 scales well up to a few cores, more so at higher resolutions
+    encode_cores = 4 if pixels >= 1920 * 1080 else 2
+    encode_memory = BASE_JOB_MEMORY_MB + frame_mb * BUFFERED_FRAMES * 2
+    cores, memory_mb = encode_cores, encode_memory
+
+    if data.get("use_face_tracking", False):
+        # Every cropped frame is held in memory until the final encode
+        cropped_mb = info["frame_count"] * target_frame_mb
+        cores = max(cores, 4)
+        memory_mb = max(memory_mb, BASE_JOB_MEMORY_MB + YOLO_MEMORY_MB + cropped_mb)
+
+    if data.get("auto_caption", False):
+        cores = max(cores, 4)
+        memory_mb = max(memory_mb, BASE_JOB_MEMORY_MB + WHISPER_MEMORY_MB)
+
+    if data.get("remove_silence", False):
+        # 16 kHz float64 stereo samples for the whole clip
+        samples_mb = info["duration"] * 16000 * 2 * 8 / (1024 * 1024)
+        memory_mb = max(memory_mb, encode_memory + samples_mb)
+
+    return cores, int(memory_mb)
+
+class JobScheduler:
+    """Admits jobs in arrival order while their combined cost fits the CPU and memory budget."""
+
+    def __init__(self, cpu_budget=None, memory_budget_mb=None):
+        self.cpu_budget = cpu_budget or os.cpu_count() or 1
+        self.memory_budget_mb = memory_budget_mb or int((total_memory_mb() or 4096) * 0.75)
+        self.used_cpu = 0
+        self.used_memory_mb = 0
+        self.running = 0
+        self.waiting = deque()
+        self.condition = threading.Condition()
+
+    def fits(self, cores, memory_mb):
+        # A lone job is always admitted, even if it is bigger than the budget
+        if self.running == 0:
+            return True
+        return (self.used_cpu + cores <= self.cpu_budget
+                and self.used_memory_mb + memory_mb <= self.memory_budget_mb)
+
+    def rebalance_threads(self):
+        """Splits the process-wide torch and OpenCV thread pools between running jobs."""
+        threads = max(1, self.cpu_budget // max(1, self.running))
+        if torch is not None:
+            torch.set_num_threads(threads)
+        if cv2 is not None:
+            cv2.setNumThreads(threads)
+
+    @contextmanager
+    def admit(self, cores, memory_mb):
+        """Blocks until the job fits, then holds its share of the budget. Yields the cores granted."""
+        cores = min(cores, self.cpu_budget)
+        ticket = object()
+
+        with self.condition:
+            self.waiting.append(ticket)
+            metrics.set_gauge("pipeline_queue_depth", len(self.waiting))
+            while self.waiting[0] is not ticket or not self.fits(cores, memory_mb):
+                self.condition.wait()
+
+            self.waiting.popleft()
+            self.used_cpu += cores
+            self.used_memory_mb += memory_mb
+            self.running += 1
+            metrics.set_gauge("pipeline_queue_depth", len(self.waiting))
+            self.rebalance_threads()
+            # The next job in line may fit too
+            self.condition.notify_all()
+
+        try:
+            yield cores
+        finally:
+            with self.condition:
+                self.used_cpu -= cores
+                self.used_memory_mb -= memory_mb
+                self.running -= 1
+                self.rebalance_threads()
+                self.condition.notify_all()
+
+    def status(self):
+        """Current budget usage, for the /scheduler endpoint."""
+        with self.condition:
+            return {
+                "cpu_budget": self.cpu_budget,
+                "memory_budget_mb": self.memory_budget_mb,
+                "used_cpu": self.used_cpu,
+                "used_memory_mb": self.used_memory_mb,
+                "running": self.running,
+                "queued": len(self.waiting),
+            }
@@ -0,0 +1,66 @@
+"""Silence detection and caption remapping for silence removal.
+
+Pure NumPy helpers, kept out of backend.py so they can be used and tested
+without loading the models.
+"""
+import numpy as np
+
+# Cutting less than this is not worth re-encoding the whole video for
+MIN_REMOVED_SECONDS = 0.25
+
+def compute_keep_intervals(samples, sample_rate, frame_ms=30, threshold_db=-40.0,
+                           min_silence=0.5, padding=0.15):
+    """Finds the non-silent (start, end) spans of an audio signal, in seconds."""
+    if samples.ndim > 1:
+        samples = samples.mean(axis=1)
+    duration = len(samples) / sample_rate
+
+    frame_len = max(1, int(sample_rate * frame_ms / 1000))
+    n_frames = len(samples) // frame_len
+    if n_frames == 0:
+        return [(0.0, duration)]
+
+    # RMS energy per frame, in dB relative to full scale
+    frames = samples[:n_frames * frame_len].reshape(n_frames, frame_len)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+    rms_db = 20 * np.log10(np.maximum(rms, 1e-10))
+    loud = rms_db > threshold_db
+
+    if not loud.any():
+        return []
+
+    # Edges of the loud runs, as frame indices
+    edges = np.diff(np.concatenate(([0], loud.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1) * frame_len / sample_rate
+    ends = np.flatnonzero(edges == -1) * frame_len / sample_rate
+
+    # Pad each run, then merge runs separated by less than min_silence
+    starts = np.maximum(starts - padding, 0.0)
+    ends = np.minimum(ends + padding, duration)
+    gaps = starts[1:] - ends[:-1]
+    split = np.flatnonzero(gaps >= min_silence)
+    merged_starts = np.concatenate(([starts[0]], starts[split + 1]))
+    merged_ends = np.concatenate((ends[split], [ends[-1]]))
+
+    return list(zip(merged_starts.tolist(), merged_ends.tolist()))
+
+def remap_captions(captions, intervals):
+    """Shifts caption timestamps onto the timeline left after silence removal."""
+    starts = np.array([start for start, _ in intervals])
+    ends = np.array([end for _, end in intervals])
+    # Start of each kept interval on the new timeline
+    offsets = np.concatenate(([0.0], np.cumsum(ends - starts)[:-1]))
+
+    remapped = []
+    for (start_time, end_time), text in captions:
+        # Intervals overlapping this caption
+        overlapping = np.flatnonzero((starts < end_time) & (ends > start_time))
+        if len(overlapping) == 0:
+            continue
+
+        first, last = overlapping[0], overlapping[-1]
+        new_start = offsets[first] + max(start_time, starts[first]) - starts[first]
+        new_end = offsets[last] + min(end_time, ends[last]) - starts[last]
+        remapped.append(((float(new_start), float(new_end)), text))
+
+    return remapped
@@ -0,0 +1,232 @@
+"""Disk lifecycle for uploads, outputs and temporary files.
+
+Every artifact the backend writes is recorded in a small JSON index with its
+size, last access time and the jobs that reference it. Each managed folder
+has a quota; when a folder goes over it, the least recently used artifacts
+are deleted first, skipping anything a running job still references.
+Intermediate files are deleted as soon as the job that produced them ends.
+"""
+import atexit
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+# Access-time updates are batched: the index is rewritten at most this often
+# (evictions and finished jobs still save it straight away)
+SAVE_INTERVAL_SECONDS = 30
+
+class StorageManager:
+    """Tracks artifacts in the managed folders and enforces per-folder quotas with LRU eviction."""
+
+    def __init__(self, quotas, index_path):
+        # quotas maps folder path -> maximum bytes
+        self.quotas = {os.path.abspath(folder): limit for folder, limit in quotas.items()}
+        self.index_path = index_path
+        self.lock = threading.RLock()
+        self.active_jobs = set()
+        self.artifacts = {}
+        # Called with the path of every artifact evicted for being over quota
+        self.on_evict = None
+        self.dirty = False
+        self.last_save = 0
+        self.load()
+        self.scan()
+        # Don't lose the last batched access times when the process exits
+        atexit.register(self.flush)
+
+    def load(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path) as f:
+                entries = json.load(f)
+            self.artifacts = {entry["path"]: dict(entry, jobs=set(entry["jobs"])) for entry in entries}
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Warning: storage index could not be read and will be rebuilt. Error: {e}")
+            self.artifacts = {}
+
+    def save(self):
+        with self.lock:
+            entries = [dict(entry, jobs=sorted(entry["jobs"])) for entry in self.artifacts.values()]
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.index_path)
+            self.dirty = False
+            self.last_save = time.monotonic()
+
+    def save_later(self):
+        """Marks the index as changed and saves it only if the last save is old enough."""
+        self.dirty = True
+        if time.monotonic() - self.last_save >= SAVE_INTERVAL_SECONDS:
+            self.save()
+
+    def flush(self):
+        """Writes out any changes that are still only in memory."""
+        with self.lock:
+            if self.dirty:
+                self.save()
+
+    def scan(self):
+        """Indexes files already in the managed folders and forgets entries whose files are gone."""
+        with self.lock:
+            for path in list(self.artifacts):
+                if not os.path.exists(path):
+                    del self.artifacts[path]
+
+            for folder in self.quotas:
+                if not os.path.isdir(folder):
+                    continue
+                for entry in os.scandir(folder):
+                    path = os.path.abspath(entry.path)
+                    if path == os.path.abspath(self.index_path) or path.endswith(".tmp"):
+                        continue
+                    if path not in self.artifacts:
+                        stat = entry.stat()
+                        self.artifacts[path] = {
+                            "path": path,
+                            "size": artifact_size(path),
+                            "last_access": max(stat.st_atime, stat.st_mtime),
+                            "jobs": set(),
+                            "intermediate": False,
+                        }
+            self.save()
+
+    def managed_folder(self, path):
+        for folder in self.quotas:
+            if os.path.commonpath([folder, path]) == folder:
+                return folder
+        return None
+
+    def artifact_path(self, path):
+        """Files inside a job folder (HLS segments) are tracked as the folder itself."""
+        path = os.path.abspath(path)
+        folder = self.managed_folder(path)
+        if folder is None:
+            return path
+        relative = os.path.relpath(path, folder)
+        return os.path.join(folder, relative.split(os.sep)[0])
+
+    def track(self, path, job_id=None, intermediate=False):
+        """Records (or refreshes) an artifact, optionally referenced by a job."""
+        if not path or not os.path.exists(path):
+            return
+        path = self.artifact_path(path)
+        if self.managed_folder(path) is None:
+            return
+        with self.lock:
+            entry = self.artifacts.setdefault(path, {
+                "path": path,
+                "size": 0,
+                "last_access": 0,
+                "jobs": set(),
+                "intermediate": False,
+            })
+            entry["size"] = artifact_size(path)
+            entry["last_access"] = time.time()
+            entry["intermediate"] = intermediate
+            if job_id:
+                entry["jobs"].add(job_id)
+            self.save_later()
+
+    def touch(self, path):
+        """Marks an artifact as just used, e.g. when it is downloaded."""
+        path = self.artifact_path(path)
+        with self.lock:
+            entry = self.artifacts.get(path)
+            if entry:
+                entry["last_access"] = time.time()
+                self.save_later()
+
+    def in_use(self, entry):
+        return bool(entry["jobs"] & self.active_jobs)
+
+    def remove(self, path):
+        """Deletes an artifact from disk and from the index."""
+        with self.lock:
+            self.artifacts.pop(path, None)
+            try:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                elif os.path.exists(path):
+                    os.remove(path)
+            except OSError as e:
+                print(f"Error removing {path}: {e}")
+
+    def enforce_quotas(self, keep=()):
+        """Evicts least recently used artifacts from every folder that is over its quota.
+
+        Paths in keep (e.g. the upload or job outputs that were just written) are never evicted.
+        """
+        keep = {self.artifact_path(path) for path in keep if path}
+        with self.lock:
+            for folder, limit in self.quotas.items():
+                entries = [entry for entry in self.artifacts.values() if self.managed_folder(entry["path"]) == folder]
+                used = sum(entry["size"] for entry in entries)
+                if used <= limit:
+                    continue
+
+                for entry in sorted(entries, key=lambda entry: entry["last_access"]):
+                    if used <= limit:
+                        break
+                    if self.in_use(entry) or entry["path"] in keep:
+                        continue
+                    print(f"Evicting {entry['path']} ({entry['size']} bytes) from {folder}")
+                    used -= entry["size"]
+                    self.remove(entry["path"])
+                    if self.on_evict is not None:
+                        self.on_evict(entry["path"])
+
+                if used > limit:
+                    print(f"Warning: {folder} is over its quota but every remaining file is in use")
+            self.save()
+
+    @contextmanager
+    def job(self, job_id):
+        """Protects the job's artifacts from eviction while it runs, then deletes its intermediates."""
+        with self.lock:
+            self.active_jobs.add(job_id)
+        try:
+            yield
+        finally:
+            outputs = []
+            with self.lock:
+                self.active_jobs.discard(job_id)
+                for entry in list(self.artifacts.values()):
+                    if job_id in entry["jobs"]:
+                        if entry["intermediate"]:
+                            self.remove(entry["path"])
+                        else:
+                            # Refresh sizes of outputs that grew while the job ran
+                            entry["size"] = artifact_size(entry["path"])
+                            outputs.append(entry["path"])
+                self.save()
+            # The job's own files must still exist when its result is returned
+            self.enforce_quotas(keep=outputs)
+
+    def status(self):
+        """Usage of each managed folder against its quota."""
+        with self.lock:
+            usage = {}
+            for folder, limit in self.quotas.items():
+                entries = [entry for entry in self.artifacts.values() if self.managed_folder(entry["path"]) == folder]
+                usage[os.path.relpath(folder)] = {
+                    "quota_bytes": limit,
+                    "used_bytes": sum(entry["size"] for entry in entries),
+                    "files": len(entries),
+                    "in_use": sum(1 for entry in entries if self.in_use(entry)),
+                }
+            return usage
+
+def artifact_size(path):
+    """Size of a file, or the total size of a folder's files."""
+    if os.path.isdir(path):
+        return sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(path)
+            for name in names
+        )
+    return os.path.getsize(path) if os.path.exists(path) else 0
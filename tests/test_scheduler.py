@@ -0,0 +1,79 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import BASE_JOB_MEMORY_MB, YOLO_MEMORY_MB, JobScheduler, estimate_job_cost
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.01)
+
+def run_job(scheduler, name, cores, memory_mb, started, release):
+    with scheduler.admit(cores, memory_mb):
+        started.append(name)
+        release[name].wait(5)
+
+def start_job(scheduler, name, cores, memory_mb, started, release):
+    release[name] = threading.Event()
+    thread = threading.Thread(target=run_job, args=(scheduler, name, cores, memory_mb, started, release))
+    thread.start()
+    return thread
+
+def test_lone_job_over_budget_is_admitted():
+    scheduler = JobScheduler(cpu_budget=2, memory_budget_mb=100)
+    with scheduler.admit(8, 1000) as granted_cores:
+        # Cores are capped to the budget; memory is admitted as asked
+        assert granted_cores == 2
+        assert scheduler.status()["used_memory_mb"] == 1000
+
+def test_budget_is_released_when_job_ends():
+    scheduler = JobScheduler(cpu_budget=4, memory_budget_mb=1000)
+    with scheduler.admit(2, 400):
+        assert scheduler.status()["running"] == 1
+
+    status = scheduler.status()
+    assert status["running"] == 0
+    assert status["used_cpu"] == 0
+    assert status["used_memory_mb"] == 0
+
+def test_jobs_are_admitted_in_arrival_order():
+    scheduler = JobScheduler(cpu_budget=4, memory_budget_mb=1000)
+    started, release = [], {}
+
+    first = start_job(scheduler, "first", 4, 500, started, release)
+    wait_until(lambda: started == ["first"])
+
+    # "big" can't fit next to "first"; "small" could, but must not jump the queue
+    big = start_job(scheduler, "big", 4, 500, started, release)
+    wait_until(lambda: scheduler.status()["queued"] == 1)
+    small = start_job(scheduler, "small", 1, 100, started, release)
+    wait_until(lambda: scheduler.status()["queued"] == 2)
+    assert started == ["first"]
+
+    release["first"].set()
+    wait_until(lambda: "big" in started)
+    release["big"].set()
+    release["small"].set()
+    for thread in (first, big, small):
+        thread.join(5)
+
+    assert started == ["first", "big", "small"]
+
+def test_face_crop_estimate_uses_the_cropped_frame_size():
+    info = {"width": 3840, "height": 2160, "frame_count": 100, "duration": 100 / 30}
+    cores, memory_mb = estimate_job_cost(info, {
+        "use_face_tracking": True,
+        "aspect_ratio": "9:16",
+        "resolution": "50%",
+    })
+
+    # 50% of 3840 wide at 9:16 is 1920x3413, not 1920x1080
+    cropped_mb = 100 * 1920 * 3413 * 3 / (1024 * 1024)
+    assert cores == 4
+    assert memory_mb == int(BASE_JOB_MEMORY_MB + YOLO_MEMORY_MB + cropped_mb)
@@ -0,0 +1,64 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from silence import compute_keep_intervals, remap_captions
+
+SAMPLE_RATE = 1000
+
+def signal(*spans):
+    """Concatenates (seconds, loud) spans into a mono signal."""
+    parts = [np.full(int(seconds * SAMPLE_RATE), 0.5 if loud else 0.0) for seconds, loud in spans]
+    return np.concatenate(parts)
+
+def keep(samples, **kwargs):
+    kwargs.setdefault("frame_ms", 10)
+    kwargs.setdefault("padding", 0.1)
+    kwargs.setdefault("min_silence", 0.5)
+    return compute_keep_intervals(samples, SAMPLE_RATE, **kwargs)
+
+def test_no_silence_keeps_the_whole_clip():
+    assert keep(signal((2, True))) == pytest.approx([(0.0, 2.0)])
+
+def test_all_silence_keeps_nothing():
+    assert keep(signal((2, False))) == []
+
+def test_long_gap_is_cut_with_padding():
+    intervals = keep(signal((0.5, True), (1, False), (0.5, True)))
+    assert intervals == pytest.approx([(0.0, 0.6), (1.4, 2.0)])
+
+def test_short_gap_is_merged():
+    intervals = keep(signal((0.5, True), (0.5, False), (0.5, True), (1, False), (0.5, True)))
+    assert intervals == pytest.approx([(0.0, 1.6), (2.4, 3.0)])
+
+def test_padding_is_clamped_to_the_clip():
+    intervals = keep(signal((1, False), (0.5, True)), padding=0.3)
+    assert intervals == pytest.approx([(0.7, 1.5)])
+
+def test_stereo_is_mixed_down():
+    mono = signal((0.5, True), (1, False), (0.5, True))
+    stereo = np.stack([mono, mono], axis=1)
+    assert keep(stereo) == pytest.approx(keep(mono))
+
+def test_input_shorter_than_a_frame_is_kept():
+    assert keep(np.zeros(5)) == pytest.approx([(0.0, 0.005)])
+
+def test_remap_shifts_captions_after_a_cut():
+    intervals = [(0.0, 1.0), (2.0, 3.0)]
+    remapped = remap_captions([((0.5, 0.8), "a"), ((2.2, 2.5), "b")], intervals)
+
+    assert [text for _, text in remapped] == ["a", "b"]
+    assert remapped[0][0] == pytest.approx((0.5, 0.8))
+    assert remapped[1][0] == pytest.approx((1.2, 1.5))
+
+def test_remap_joins_a_caption_spanning_a_cut():
+    remapped = remap_captions([((0.8, 2.4), "spans")], [(0.0, 1.0), (2.0, 3.0)])
+    assert remapped[0][0] == pytest.approx((0.8, 1.4))
+
+def test_remap_drops_captions_inside_a_cut():
+    remapped = remap_captions([((1.2, 1.8), "gone"), ((2.5, 2.9), "kept")], [(0.0, 1.0), (2.0, 3.0)])
+    assert [text for _, text in remapped] == ["kept"]
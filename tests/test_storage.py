@@ -0,0 +1,135 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage
+from storage import StorageManager
+
+def write_file(path, size):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    return path
+
+def make_manager(tmp_path, quota):
+    folder = tmp_path / "output"
+    folder.mkdir()
+    manager = StorageManager({str(folder): quota}, str(tmp_path / "index.json"))
+    return manager, str(folder)
+
+def test_evicts_least_recently_used_first(tmp_path):
+    manager, folder = make_manager(tmp_path, 250)
+    old = write_file(os.path.join(folder, "old.mp4"), 100)
+    middle = write_file(os.path.join(folder, "middle.mp4"), 100)
+    new = write_file(os.path.join(folder, "new.mp4"), 100)
+    for path in (old, middle, new):
+        manager.track(path)
+    manager.artifacts[old]["last_access"] = 1
+    manager.artifacts[middle]["last_access"] = 2
+    manager.artifacts[new]["last_access"] = 3
+
+    manager.enforce_quotas()
+
+    assert not os.path.exists(old)
+    assert os.path.exists(middle)
+    assert os.path.exists(new)
+    assert old not in manager.artifacts
+
+def test_touch_protects_recently_downloaded_file(tmp_path):
+    manager, folder = make_manager(tmp_path, 150)
+    first = write_file(os.path.join(folder, "first.mp4"), 100)
+    second = write_file(os.path.join(folder, "second.mp4"), 100)
+    manager.track(first)
+    manager.track(second)
+    manager.artifacts[first]["last_access"] = 1
+    manager.artifacts[second]["last_access"] = 2
+
+    manager.touch(first)
+    manager.enforce_quotas()
+
+    assert os.path.exists(first)
+    assert not os.path.exists(second)
+
+def test_skips_files_referenced_by_running_job(tmp_path):
+    manager, folder = make_manager(tmp_path, 50)
+    source = write_file(os.path.join(folder, "source.mp4"), 100)
+
+    with manager.job("job1"):
+        manager.track(source, job_id="job1")
+        manager.enforce_quotas()
+        assert os.path.exists(source)
+
+    # The job's own files survive its end, but are fair game for the next pass
+    assert os.path.exists(source)
+    manager.enforce_quotas()
+    assert not os.path.exists(source)
+
+def test_job_output_over_quota_survives_the_job(tmp_path):
+    manager, folder = make_manager(tmp_path, 50)
+    older = write_file(os.path.join(folder, "older.mp4"), 40)
+    manager.track(older)
+    manager.artifacts[older]["last_access"] = 1
+
+    with manager.job("job1"):
+        result = write_file(os.path.join(folder, "result.mp4"), 100)
+        manager.track(result, job_id="job1")
+
+    assert os.path.exists(result)
+    assert not os.path.exists(older)
+
+def test_just_tracked_upload_is_not_evicted(tmp_path):
+    manager, folder = make_manager(tmp_path, 50)
+    upload = write_file(os.path.join(folder, "upload.mp4"), 100)
+    manager.track(upload)
+
+    manager.enforce_quotas(keep=[upload])
+
+    assert os.path.exists(upload)
+
+def test_job_end_removes_intermediates_only(tmp_path):
+    manager, folder = make_manager(tmp_path, 10_000)
+    trimmed = write_file(os.path.join(folder, "trimmed.mp4"), 100)
+    result = write_file(os.path.join(folder, "result.mp4"), 100)
+
+    with manager.job("job1"):
+        manager.track(trimmed, job_id="job1", intermediate=True)
+        manager.track(result, job_id="job1")
+
+    assert not os.path.exists(trimmed)
+    assert os.path.exists(result)
+
+def test_job_folder_is_evicted_as_one_artifact(tmp_path):
+    manager, folder = make_manager(tmp_path, 150)
+    segment = write_file(os.path.join(folder, "job1", "segment0.m4s"), 100)
+    write_file(os.path.join(folder, "job1", "segment1.m4s"), 100)
+    manager.track(segment)
+
+    job_folder = os.path.join(folder, "job1")
+    assert manager.artifacts[job_folder]["size"] == 200
+
+    evicted = []
+    manager.on_evict = evicted.append
+    manager.enforce_quotas()
+
+    assert not os.path.exists(job_folder)
+    assert evicted == [job_folder]
+
+def test_touch_batches_index_writes(tmp_path, monkeypatch):
+    manager, folder = make_manager(tmp_path, 10_000)
+    path = write_file(os.path.join(folder, "clip.mp4"), 100)
+    manager.track(path)
+    manager.artifacts[path]["last_access"] = 1
+    manager.save()
+
+    monkeypatch.setattr(storage, "SAVE_INTERVAL_SECONDS", 3600)
+    manager.touch(path)
+    with open(manager.index_path) as f:
+        saved = {entry["path"]: entry for entry in json.load(f)}
+    assert saved[path]["last_access"] < manager.artifacts[path]["last_access"]
+
+    manager.flush()
+    with open(manager.index_path) as f:
+        saved = {entry["path"]: entry for entry in json.load(f)}
+    assert saved[path]["last_access"] == manager.artifacts[path]["last_access"]